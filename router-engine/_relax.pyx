@@ -0,0 +1,59 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""Cython build of the Bellman-Ford relaxation kernel
+
+Mirrors optimized_router.relax; build in place with `make build-ext`.
+"""
+
+
+cpdef void relax(const int[::1] indptr, const int[::1] indices, const double[::1] reserve_in,
+                 const double[::1] reserve_out, const double[::1] fee_factor,
+                 const unsigned char[::1] edge_mask, double[:, ::1] amount,
+                 int[:, ::1] predecessor, int[:, ::1] pred_edge, int max_hops):
+    """Hop-bounded Bellman-Ford relaxation maximising the simulated output amount per token"""
+    cdef int n_tokens = indptr.shape[0] - 1
+    cdef int h, g, u, v, w, pos
+    cdef double amount_u, amount_in, r_in, r_out, out
+    cdef bint updated
+    
+    # Only typed memoryviews are touched, so the GIL is released for the whole pass
+    with nogil:
+        for h in range(1, max_hops + 1):
+            updated = False
+            for u in range(n_tokens):
+                amount_u = amount[h - 1, u]
+                if amount_u <= 0.0:
+                    continue
+                
+                for pos in range(indptr[u], indptr[u + 1]):
+                    if not edge_mask[pos]:
+                        continue
+                    
+                    r_in = reserve_in[pos]
+                    r_out = reserve_out[pos]
+                    if r_in <= 0.0 or r_out <= 0.0:
+                        continue
+                    
+                    # Constant product output on the input left after the fee
+                    amount_in = amount_u * fee_factor[pos]
+                    out = r_out * amount_in / (r_in + amount_in)
+                    v = indices[pos]
+                    if out <= amount[h, v]:
+                        continue
+                    
+                    # Forbid revisits: walk the path of u back to the source in row 0
+                    w = u
+                    g = h - 1
+                    while g > 0 and w != v:
+                        w = predecessor[g, w]
+                        g -= 1
+                    if w == v:
+                        continue
+                    
+                    amount[h, v] = out
+                    predecessor[h, v] = u
+                    pred_edge[h, v] = pos
+                    updated = True
+            
+            # No path of h hops means none of h + 1 hops either
+            if not updated:
+                break
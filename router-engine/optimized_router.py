@@ -1,11 +1,14 @@
-import networkx as nx
 import numpy as np
 import torch
 import json
 import asyncio
+import io
 import logging
-from typing import List, Dict, Tuple, Optional, Any
-from dataclasses import dataclass
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, FrozenSet, Set, Tuple, Optional, Any, Callable
+from dataclasses import dataclass, replace
 
 # Configure logging
 logging.basicConfig(
@@ -23,8 +26,78 @@ except ImportError:
     RUST_ENGINE_AVAILABLE = False
     logger.warning("Rust router engine not available, using pure Python implementation")
 
+# TensorRT is only used for optional GPU inference of the price predictor
+try:
+    import tensorrt as trt
+    TENSORRT_AVAILABLE = True
+except ImportError:
+    TENSORRT_AVAILABLE = False
+
+# orjson is much faster than the stdlib for the Rust engine's JSON boundary
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# JIT-compile the relaxation kernel if Numba is available
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    logger.warning("Numba not available, routing kernel runs in the interpreter")
+    
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit"""
+        def decorator(func):
+            return func
+        return decorator
+
+
+# Base gas cost for a swap
+BASE_GAS_COST = 100000
+
+# Additional cost per hop
+HOP_GAS_COST = 70000
+
+# Known exchanges are resolved to a small integer id once, at add_pool time
+EXCH_ID = {"uniswap": 0, "sushiswap": 1, "curve": 2, "balancer": 3}
+EXCH_OTHER = 4  # Any other exchange; adds reputational risk to a route
+
+# Exchange-specific adjustments, indexed by exchange id
+EXCH_COST = np.array([
+    0,       # uniswap
+    5000,    # sushiswap
+    -10000,  # curve, often more gas efficient
+    15000,   # balancer
+    0,       # other
+], dtype=np.int32)
+
+# Slippage buffer applied to each step's minimum output
+DEFAULT_SLIPPAGE = 0.005  # 0.5%
+
+# Pool fee tiers are quoted in percent (0.3 is a 0.3% fee)
+FEE_TIER_UNIT = 0.01
+
+# Longest route the search returns; every extra hop costs HOP_GAS_COST and raises the risk score
+MAX_PATH_HOPS = 4
+
+# Hop radius around the input and output tokens of the subgraph a path search runs on;
+# every token on a route of at most MAX_PATH_HOPS hops is this close to both ends
+SUBGRAPH_MAX_HOPS = MAX_PATH_HOPS
+
+# Route cache entries kept before the least recently used one is dropped
+ROUTE_CACHE_SIZE = 4096
+
+# Registry key of a token: (chain_id, address)
+TokenKey = Tuple[int, str]
 
-@dataclass
+# Route cache key: (src, dst, amount bucket, k)
+RouteKey = Tuple[int, int, int, int]
+
+
+@dataclass(slots=True)
 class Token:
     chain_id: int
     address: str
@@ -32,7 +105,7 @@ class Token:
     decimals: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Pool:
     exchange: str
     token_a: Token
@@ -44,26 +117,51 @@ class Pool:
     liquidity: float
 
 
-@dataclass
+@dataclass(slots=True)
 class SwapStep:
     exchange_id: str
     token_in: Token
     token_out: Token
     fee_tier: Optional[float]
-    amount_in: str
-    amount_out_min: str
+    amount_in: int
+    amount_out_min: int
 
 
-@dataclass
+@dataclass(slots=True)
 class SwapRoute:
     steps: List[SwapStep]
-    amount_in: str
-    expected_amount_out: str
+    amount_in: int
+    expected_amount_out: int
     price_impact: float
     gas_estimate: int
     risk_score: int
 
 
+@dataclass(slots=True)
+class CSRGraph:
+    """Compressed sparse row (struct-of-arrays) view of the liquidity graph"""
+    indptr: np.ndarray       # int32[n_tokens + 1], outgoing edge range per token id
+    indices: np.ndarray      # int32[n_edges], destination token id
+    sources: np.ndarray      # int32[n_edges], source token id
+    edge_ids: np.ndarray     # int32[n_edges], index into OptimizedRouter._edges
+    edge_pos: np.ndarray     # int32[n_edges], CSR position of each edge id
+    reserve_a: np.ndarray    # float64[n_edges], reserve of the input token
+    reserve_b: np.ndarray    # float64[n_edges], reserve of the output token
+    fee_factor: np.ndarray   # float64[n_edges], share of the input left after the pool fee
+
+    @property
+    def n_tokens(self) -> int:
+        return len(self.indptr) - 1
+
+
+@dataclass(slots=True)
+class SourceSearch:
+    """Search state shared by the route queries of one input token"""
+    graph: CSRGraph        # CSR view the state was computed on
+    version: int           # OptimizedRouter._graph_version graph reflects
+    forward: np.ndarray    # bool[n_tokens], tokens within SUBGRAPH_MAX_HOPS of the source
+
+
 class FlashbotsRPC:
     """Interface to Flashbots for MEV protection"""
     
@@ -86,8 +184,15 @@ class FlashbotsRPC:
 class PricePredictor:
     """ML model for price prediction and route adjustment"""
     
-    def __init__(self, model_path: Optional[str] = None):
+    def __init__(self, model_path: Optional[str] = None, use_tensorrt: bool = False):
         self.model = self._load_model(model_path)
+        self.qmodel = self._quantize_model(self.model)
+        self.scripted = self._script_model(self.qmodel)
+        self.trt_engine = None
+        self._trt_context = None
+        self._trt_max_batch = 0
+        if use_tensorrt:
+            self.build_trt_engine()
     
     def _load_model(self, model_path: Optional[str]) -> Optional[torch.nn.Module]:
         """Load PyTorch model from path or create a simple one"""
@@ -108,129 +213,421 @@ class PricePredictor:
         )
         return model
     
+    def _quantize_model(self, model: torch.nn.Module) -> torch.nn.Module:
+        """Quantize Linear layers to INT8 for CPU inference"""
+        model.eval()
+        try:
+            return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        except Exception as e:
+            logger.warning(f"Dynamic quantization failed, using FP32 model: {e}")
+            return model
+    
+    def build_trt_engine(self, max_batch: int = 256) -> bool:
+        """Export the FP32 model to ONNX in memory and build an FP16 TensorRT engine for GPU inference"""
+        if not TENSORRT_AVAILABLE or not torch.cuda.is_available():
+            logger.warning("TensorRT or CUDA not available, keeping the quantized CPU model")
+            return False
+        
+        try:
+            onnx_model = io.BytesIO()
+            torch.onnx.export(
+                self.model,
+                torch.zeros((1, 10), dtype=torch.float32),
+                onnx_model,
+                input_names=['features'],
+                output_names=['score'],
+                dynamic_axes={'features': {0: 'batch'}, 'score': {0: 'batch'}}
+            )
+            
+            trt_logger = trt.Logger(trt.Logger.WARNING)
+            builder = trt.Builder(trt_logger)
+            network = builder.create_network(1 << int(trt.NetworkDefinitionCreationFlag.EXPLICIT_BATCH))
+            parser = trt.OnnxParser(network, trt_logger)
+            if not parser.parse(onnx_model.getvalue()):
+                raise RuntimeError(parser.get_error(0))
+            
+            config = builder.create_builder_config()
+            config.set_flag(trt.BuilderFlag.FP16)
+            profile = builder.create_optimization_profile()
+            profile.set_shape('features', (1, 10), (32, 10), (max_batch, 10))
+            config.add_optimization_profile(profile)
+            
+            serialized = builder.build_serialized_network(network, config)
+            self.trt_engine = trt.Runtime(trt_logger).deserialize_cuda_engine(serialized)
+            self._trt_context = self.trt_engine.create_execution_context()
+            self._trt_max_batch = max_batch
+        except Exception as e:
+            logger.error(f"Failed to build TensorRT engine: {e}")
+            self.trt_engine = None
+            self._trt_context = None
+            return False
+        
+        logger.info(f"Built TensorRT FP16 engine for batches of up to {max_batch}")
+        return True
+    
+    def _predict(self, features: np.ndarray) -> np.ndarray:
+        """Score an (N, 10) feature matrix, on the TensorRT engine when one is built"""
+        if self.trt_engine is not None and len(features) <= self._trt_max_batch:
+            inputs = torch.from_numpy(features).cuda()
+            outputs = torch.empty((len(features), 1), dtype=torch.float32, device='cuda')
+            self._trt_context.set_input_shape('features', tuple(inputs.shape))
+            self._trt_context.execute_v2([inputs.data_ptr(), outputs.data_ptr()])
+            return outputs.reshape(-1).cpu().numpy()
+        
+        with torch.inference_mode():
+            return self.scripted(torch.from_numpy(features)).reshape(-1).numpy()
+    
+    def _script_model(self, model: torch.nn.Module) -> torch.nn.Module:
+        """Compile the model with TorchScript, falling back to eager mode"""
+        model.eval()
+        try:
+            return torch.jit.script(model).eval()
+        except Exception as e:
+            logger.warning(f"TorchScript compilation failed, using eager model: {e}")
+            return model
+    
+    def _extract_features(self, paths: List[SwapRoute]) -> np.ndarray:
+        """Stack per-route features into an (N, 10) float32 matrix"""
+        features = np.zeros((len(paths), 10), dtype=np.float32)
+        features[:, 0] = [len(path.steps) for path in paths]
+        # Amounts are clipped at 0 so log1p never produces NaN
+        features[:, 1] = np.log1p(np.maximum([float(path.amount_in) for path in paths], 0.0))
+        features[:, 2] = np.log1p(np.maximum([float(path.expected_amount_out) for path in paths], 0.0))
+        features[:, 3] = [path.price_impact for path in paths]
+        features[:, 4] = [path.gas_estimate / 1e6 for path in paths]
+        features[:, 5] = [path.risk_score for path in paths]
+        features[:, 6] = [
+            sum(step.fee_tier or 0.0 for step in path.steps) / max(1, len(path.steps))
+            for path in paths
+        ]
+        # Remaining columns are reserved for market features (volatility, volume, ...)
+        return features
+    
     def adjust(self, paths: List[SwapRoute]) -> List[SwapRoute]:
         """Adjust routes based on ML predictions"""
         if not paths:
             return paths
+        return self.adjust_batch([paths])[0]
+    
+    def adjust_batch(self, route_lists: List[List[SwapRoute]]) -> List[List[SwapRoute]]:
+        """Adjust several route lists with a single forward pass of the model
+        
+        The INT8 model quantizes its activations with a scale taken from the
+        whole input batch, so scores (and expected_amount_out) can differ
+        slightly from adjusting each list on its own with adjust.
+        """
+        paths = [path for routes in route_lists for path in routes]
+        if not paths:
+            return route_lists
         
-        # In a real implementation, we would extract features from paths
-        # and use the model to predict adjustments
         logger.info(f"Adjusting {len(paths)} routes with ML model")
         
-        # Simple demonstration of adjustment
-        for path in paths:
-            # Apply a small random adjustment to expected_amount_out
-            adjustment = 1.0 + (np.random.random() - 0.5) * 0.01
-            current_amount = int(path.expected_amount_out)
-            path.expected_amount_out = str(int(current_amount * adjustment))
+        # One batched forward pass over all routes
+        scores = self._predict(self._extract_features(paths))
+        
+        # Map the model output in [0, 1] onto a +/-0.5% adjustment of expected_amount_out;
+        # routes with a non-finite score are left unadjusted
+        scores = scores.astype(np.float64)
+        adjustments = np.where(np.isfinite(scores), 1.0 + (scores - 0.5) * 0.01, 1.0)
+        adjusted = np.array([float(path.expected_amount_out) for path in paths]) * adjustments
+        for path, amount in zip(paths, adjusted.tolist()):
+            path.expected_amount_out = int(amount)
+        
+        # Sort each list by expected_amount_out in descending order
+        return [
+            sorted(routes, key=lambda p: p.expected_amount_out, reverse=True)
+            for routes in route_lists
+        ]
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def relax(indptr: np.ndarray, indices: np.ndarray, reserve_in: np.ndarray, reserve_out: np.ndarray,
+          fee_factor: np.ndarray, edge_mask: np.ndarray, amount: np.ndarray, predecessor: np.ndarray,
+          pred_edge: np.ndarray, max_hops: int) -> None:
+    """Hop-bounded Bellman-Ford relaxation maximising the simulated output amount per token
+    
+    Row h of the (max_hops + 1, n_tokens) amount/predecessor/pred_edge arrays
+    receives the best path of exactly h hops to every token. Row 0 of amount
+    holds the input amount at the source and 0 elsewhere; all other entries
+    start at 0 and -1. predecessor[h, v] is the token before v, found in row
+    h - 1. A relaxation u -> v is rejected when v is already on the path of
+    u, so paths never revisit a token. Each hop pays its pool fee on the
+    input side; pools without reserves are skipped. Compiled with Numba when
+    available, so it must only touch the arrays; the compiled kernel
+    releases the GIL and can run on worker threads.
+    """
+    n_tokens = len(indptr) - 1
+    for h in range(1, max_hops + 1):
+        updated = False
+        for u in range(n_tokens):
+            amount_u = amount[h - 1, u]
+            if amount_u <= 0.0:
+                continue
+            
+            for pos in range(indptr[u], indptr[u + 1]):
+                if not edge_mask[pos]:
+                    continue
+                
+                r_in = reserve_in[pos]
+                r_out = reserve_out[pos]
+                if r_in <= 0.0 or r_out <= 0.0:
+                    continue
+                
+                # Constant product output on the input left after the fee
+                amount_in = amount_u * fee_factor[pos]
+                out = r_out * amount_in / (r_in + amount_in)
+                v = indices[pos]
+                if out <= amount[h, v]:
+                    continue
+                
+                # Forbid revisits: walk the path of u back to the source in row 0
+                w = u
+                g = h - 1
+                while g > 0 and w != v:
+                    w = predecessor[g, w]
+                    g -= 1
+                if w == v:
+                    continue
+                
+                amount[h, v] = out
+                predecessor[h, v] = u
+                pred_edge[h, v] = pos
+                updated = True
         
-        # Sort by expected_amount_out in descending order
-        return sorted(paths, key=lambda p: int(p.expected_amount_out), reverse=True)
+        # No path of h hops means none of h + 1 hops either
+        if not updated:
+            break
+
+
+# Prefer the Cython build of the kernel when it has been compiled (make build-ext)
+try:
+    from _relax import relax as cython_relax
+    CYTHON_KERNEL_AVAILABLE = True
+    logger.info("Cython relaxation kernel loaded successfully")
+except ImportError:
+    CYTHON_KERNEL_AVAILABLE = False
+
+relax_kernel = cython_relax if CYTHON_KERNEL_AVAILABLE else relax
 
 
 class OptimizedRouter:
     """Main router class implementing the path-finding algorithm"""
     
     def __init__(self, flashbots_relay: str = "https://relay.flashbots.net"):
-        self.graph = nx.DiGraph()  # Dynamic liquidity graph
         self.mev_shield = FlashbotsRPC(flashbots_relay)
         self.predictor = PricePredictor()
         self.pools: Dict[str, Pool] = {}
-        self.tokens: Dict[str, Token] = {}
+        self.tokens: Dict[TokenKey, Token] = {}
+        
+        # Dynamic liquidity graph: tokens are interned into dense integer ids,
+        # pool i owns edges 2*i (a -> b) and 2*i + 1 (b -> a)
+        self._token_ids: Dict[TokenKey, int] = {}
+        self._token_keys: List[TokenKey] = []
+        self._pool_index: Dict[str, int] = {}
+        self._edges: List[Dict[str, Any]] = []
+        self._edge_src: List[int] = []
+        self._edge_dst: List[int] = []
+        self._csr: Optional[CSRGraph] = None  # Rebuilt lazily after the topology changes
+        self._dirty_pools: Set[int] = set()  # Pools whose reserves changed since the last query
+        self._csr_readers = 0  # Worker-thread jobs still reading the current CSR arrays
+        self._graph_version = 0  # Bumped by every pool added or updated
+        
+        # Top-k paths as CSR edge positions in least recently used order, with
+        # the token ids of the subgraph they were searched on; the reverse
+        # index maps each token id to the keys whose subgraph holds it
+        self._route_cache: OrderedDict[RouteKey, Tuple[List[List[int]], FrozenSet[int]]] = OrderedDict()
+        self._routes_by_token: Dict[int, Set[RouteKey]] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # Path searches run off the event loop; the compiled kernels release the GIL
+        self._executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+    
+    def _token_key(self, token: Token) -> TokenKey:
+        """Registry key of a token"""
+        return (token.chain_id, token.address)
+    
+    def _intern_token(self, token: Token) -> int:
+        """Register a token and return its dense id"""
+        token_key = self._token_key(token)
+        token_id = self._token_ids.get(token_key)
+        if token_id is None:
+            token_id = len(self._token_keys)
+            self._token_ids[token_key] = token_id
+            self._token_keys.append(token_key)
+            self.tokens[token_key] = token
+        return token_id
+    
+    def _pool_edges(self, pool: Pool, pool_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Edge attributes of a pool in both directions; reserve_a is always the input side"""
+        forward = {
+            'pool_id': pool_id,
+            'exchange': pool.exchange,
+            'exchange_id': EXCH_ID.get(pool.exchange.lower(), EXCH_OTHER),
+            'fee_tier': pool.fee_tier,
+            'price': pool.price,
+            'liquidity': pool.liquidity,
+            'reserve_a': pool.reserve_a,
+            'reserve_b': pool.reserve_b,
+        }
+        reverse = dict(
+            forward,
+            price=1.0 / pool.price,
+            reserve_a=pool.reserve_b,
+            reserve_b=pool.reserve_a,
+        )
+        return forward, reverse
     
     def add_pool(self, pool: Pool) -> None:
         """Add a liquidity pool to the graph"""
         pool_id = f"{pool.exchange}_{pool.token_a.address}_{pool.token_b.address}_{pool.fee_tier}"
+        if pool_id in self._pool_index:
+            self.update_pool(pool)
+            return
         self.pools[pool_id] = pool
         
         # Add tokens to the token registry if not already present
-        token_a_key = f"{pool.token_a.chain_id}_{pool.token_a.address}"
-        token_b_key = f"{pool.token_b.chain_id}_{pool.token_b.address}"
-        
-        if token_a_key not in self.tokens:
-            self.tokens[token_a_key] = pool.token_a
-        
-        if token_b_key not in self.tokens:
-            self.tokens[token_b_key] = pool.token_b
-        
-        # Add edges to the graph in both directions
-        # Edge attributes include data needed for routing
-        self.graph.add_edge(
-            token_a_key,
-            token_b_key,
-            pool_id=pool_id,
-            exchange=pool.exchange,
-            fee_tier=pool.fee_tier,
-            price=pool.price,
-            liquidity=pool.liquidity,
-            reserve_a=pool.reserve_a,
-            reserve_b=pool.reserve_b
-        )
+        token_a_id = self._intern_token(pool.token_a)
+        token_b_id = self._intern_token(pool.token_b)
         
-        self.graph.add_edge(
-            token_b_key,
-            token_a_key,
-            pool_id=pool_id,
-            exchange=pool.exchange,
-            fee_tier=pool.fee_tier,
-            price=1.0 / pool.price,
-            liquidity=pool.liquidity,
-            reserve_a=pool.reserve_b,
-            reserve_b=pool.reserve_a
-        )
+        self._pool_index[pool_id] = len(self._pool_index)
+        self._edges.extend(self._pool_edges(pool, pool_id))
+        self._edge_src.extend((token_a_id, token_b_id))
+        self._edge_dst.extend((token_b_id, token_a_id))
+        
+        # New edges change the graph topology, so the CSR view is rebuilt and
+        # cached edge positions are no longer valid
+        self._csr = None
+        self._route_cache.clear()
+        self._routes_by_token.clear()
+        self._graph_version += 1
         
         logger.debug(f"Added pool {pool_id} to the graph")
     
-    def _calculate_price_impact(self, amount: int, reserve_in: int, reserve_out: int) -> float:
-        """Calculate price impact of a swap"""
-        if amount <= 0 or reserve_in <= 0 or reserve_out <= 0:
-            return 1.0
+    def update_pool(self, pool: Pool) -> None:
+        """Refresh reserves, price and liquidity of a pool already in the graph"""
+        pool_id = f"{pool.exchange}_{pool.token_a.address}_{pool.token_b.address}_{pool.fee_tier}"
+        index = self._pool_index.get(pool_id)
+        if index is None:
+            self.add_pool(pool)
+            return
+        self.pools[pool_id] = pool
+        
+        self._edges[2 * index], self._edges[2 * index + 1] = self._pool_edges(pool, pool_id)
+        
+        # Only the reserves of this pool need to reach the CSR arrays, and only
+        # searches whose subgraph holds its tokens need to run again
+        self._dirty_pools.add(index)
+        self._evict_routes((self._edge_src[2 * index], self._edge_dst[2 * index]))
+        self._graph_version += 1
+        
+        logger.debug(f"Updated pool {pool_id}")
+    
+    def _build_csr(self) -> CSRGraph:
+        """Pack the edge list into CSR arrays ordered by source token id"""
+        n_tokens = len(self._token_keys)
+        src = np.array(self._edge_src, dtype=np.int32)
+        dst = np.array(self._edge_dst, dtype=np.int32)
+        order = np.argsort(src, kind='stable').astype(np.int32)
+        
+        indptr = np.zeros(n_tokens + 1, dtype=np.int32)
+        indptr[1:] = np.cumsum(np.bincount(src, minlength=n_tokens))
+        
+        edge_pos = np.empty_like(order)
+        edge_pos[order] = np.arange(len(order), dtype=np.int32)
+        
+        edges = [self._edges[e] for e in order.tolist()]
+        return CSRGraph(
+            indptr=indptr,
+            indices=dst[order],
+            sources=src[order],
+            edge_ids=order,
+            edge_pos=edge_pos,
+            reserve_a=np.array([data['reserve_a'] for data in edges], dtype=np.float64),
+            reserve_b=np.array([data['reserve_b'] for data in edges], dtype=np.float64),
+            fee_factor=1.0 - np.array([data['fee_tier'] for data in edges], dtype=np.float64) * FEE_TIER_UNIT,
+        )
+    
+    def _patch_csr(self, graph: CSRGraph, copy: bool) -> CSRGraph:
+        """Return the CSR view with the reserves of dirty pools written in
+        
+        With copy, the reserve arrays are copied first so that searches still
+        running on worker threads keep reading the previous ones; otherwise
+        graph is patched in place.
+        """
+        if copy:
+            graph = replace(graph, reserve_a=graph.reserve_a.copy(), reserve_b=graph.reserve_b.copy())
+        reserve_a = graph.reserve_a
+        reserve_b = graph.reserve_b
+        for index in self._dirty_pools:
+            for edge_id in (2 * index, 2 * index + 1):
+                pos = graph.edge_pos[edge_id]
+                data = self._edges[edge_id]
+                reserve_a[pos] = data['reserve_a']
+                reserve_b[pos] = data['reserve_b']
+        self._dirty_pools.clear()
+        return graph
+    
+    def _get_csr(self) -> CSRGraph:
+        """Return the CSR view of the graph, rebuilding or patching it if stale"""
+        if self._csr is None:
+            self._csr = self._build_csr()
+            self._csr_readers = 0
+            self._dirty_pools.clear()
+        elif self._dirty_pools:
+            # Copy the O(E) reserve arrays only while a search still holds them
+            self._csr = self._patch_csr(self._csr, copy=self._csr_readers > 0)
+            self._csr_readers = 0
+        return self._csr
+    
+    def _release_csr(self, graph: CSRGraph) -> None:
+        """Drop a reader of graph; views replaced in the meantime keep their own count"""
+        if graph is self._csr:
+            self._csr_readers -= 1
+    
+    async def _run_on_graph(self, graph: CSRGraph, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func on the thread pool, counting it as a reader of graph until it returns"""
+        future = asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        if graph is self._csr:
+            self._csr_readers += 1
+            # The callback fires when the worker is done, even if the caller is cancelled
+            future.add_done_callback(lambda _: self._release_csr(graph))
+        return await asyncio.shield(future)
+    
+    def _calculate_price_impact(self, amount: np.ndarray, reserve_in: np.ndarray,
+                                reserve_out: np.ndarray) -> np.ndarray:
+        """Calculate price impact of swaps, vectorized over arrays of amounts and pool reserves"""
+        valid = (amount > 0) & (reserve_in > 0) & (reserve_out > 0)
         
         # Using constant product formula (x * y = k)
         # New reserve after swap: reserve_in + amount
         # New output reserve: k / new_reserve_in
-        # Output amount: reserve_out - new_output_reserve
         
         k = reserve_in * reserve_out
         new_reserve_in = reserve_in + amount
-        new_reserve_out = k / new_reserve_in
-        output_amount = reserve_out - new_reserve_out
         
         # Price before swap: reserve_out / reserve_in
         # Price after swap: new_reserve_out / new_reserve_in
         # Price impact: 1 - (price_after / price_before)
         
-        price_before = reserve_out / reserve_in
-        price_after = new_reserve_out / new_reserve_in
-        price_impact = 1.0 - (price_after / price_before)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            new_reserve_out = k / new_reserve_in
+            price_before = reserve_out / reserve_in
+            price_after = new_reserve_out / new_reserve_in
+            price_impact = 1.0 - (price_after / price_before)
         
-        return max(0.0, min(1.0, price_impact))
+        return np.where(valid, np.clip(price_impact, 0.0, 1.0), 1.0)
     
-    def _calculate_gas_cost(self, path_length: int, exchanges: List[str]) -> int:
-        """Estimate gas cost for a path"""
-        # Base gas cost for a swap
-        base_cost = 100000
-        
-        # Additional cost per hop
-        hop_cost = 70000
-        
-        # Exchange-specific adjustments
-        exchange_costs = {
-            "uniswap": 0,
-            "sushiswap": 5000,
-            "curve": -10000,  # Curve is often more gas efficient
-            "balancer": 15000,
-        }
-        
-        total_cost = base_cost + (path_length - 1) * hop_cost
+    def _calculate_gas_cost(self, path_length: int, exch_ids: np.ndarray) -> int:
+        """Estimate gas cost for a path from the exchange id of each hop"""
+        total_cost = BASE_GAS_COST + (path_length - 1) * HOP_GAS_COST
         
         # Add exchange-specific costs
-        for exchange in exchanges:
-            total_cost += exchange_costs.get(exchange.lower(), 0)
+        total_cost += int(EXCH_COST[exch_ids].sum())
         
         return total_cost
     
-    def _calculate_risk_score(self, path: List[Tuple[str, str, Dict]]) -> int:
+    def _calculate_risk_score(self, path: List[Tuple[TokenKey, TokenKey, Dict]]) -> int:
         """Calculate risk score (1-5) for a path"""
         # Factors affecting risk:
         # 1. Number of hops (more hops = higher risk)
@@ -250,7 +647,8 @@ class OptimizedRouter:
             base_risk = 4
         
         # Adjust for liquidity
-        min_liquidity = min(data.get('liquidity', 1e18) for _, _, data in path)
+        min_liquidity = np.min(np.fromiter((data['liquidity'] for _, _, data in path),
+                                           dtype=np.float64, count=hop_count))
         liquidity_factor = 0
         if min_liquidity < 1e5:
             liquidity_factor = 2
@@ -258,9 +656,8 @@ class OptimizedRouter:
             liquidity_factor = 1
         
         # Exchange reputation factor
-        exchanges = [data.get('exchange', '') for _, _, data in path]
-        high_risk_exchanges = sum(1 for ex in exchanges if ex.lower() not in 
-                                 ['uniswap', 'sushiswap', 'curve', 'balancer'])
+        exch_ids = np.fromiter((data['exchange_id'] for _, _, data in path), dtype=np.int8, count=hop_count)
+        high_risk_exchanges = int(np.count_nonzero(exch_ids == EXCH_OTHER))
         exchange_factor = min(2, high_risk_exchanges)
         
         # Calculate final risk score
@@ -269,119 +666,371 @@ class OptimizedRouter:
         # Cap at 5
         return min(5, risk_score)
     
-    def _weight_function(self, u: str, v: str, data: Dict) -> float:
-        """Multi-dimensional weight function for path finding"""
-        price_impact_weight = 0.6
-        gas_cost_weight = 0.3
-        slippage_weight = 0.1
-        
-        # Extract or calculate components
-        price_impact = data.get('price_impact', 0.01)
-        gas_cost = data.get('gas_cost', 100000) / 1e6  # Normalize
-        slippage = data.get('slippage', 0.005)
-        
-        # Combine weights
-        return (
-            price_impact_weight * price_impact +
-            gas_cost_weight * gas_cost +
-            slippage_weight * slippage
+    def _relax_from(self, graph: CSRGraph, source: int, amount: float, edge_mask: np.ndarray,
+                    max_hops: int = MAX_PATH_HOPS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Run one relaxation from source and return the (amount, predecessor, pred_edge) tree
+        
+        Each array has one row per path length from 0 to max_hops.
+        """
+        shape = (max_hops + 1, graph.n_tokens)
+        amounts = np.zeros(shape, dtype=np.float64)
+        predecessor = np.full(shape, -1, dtype=np.int32)
+        pred_edge = np.full(shape, -1, dtype=np.int32)
+        amounts[0, source] = amount
+        
+        relax_kernel(graph.indptr, graph.indices, graph.reserve_a, graph.reserve_b, graph.fee_factor,
+                     edge_mask, amounts, predecessor, pred_edge, max_hops)
+        return amounts, predecessor, pred_edge
+    
+    def _trace_path(self, tree: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                    target: int) -> Optional[Tuple[float, List[int]]]:
+        """Return (amount_out, edge positions) from the tree's root to target"""
+        amounts, predecessor, pred_edge = tree
+        # Best output over every path length of at least one hop
+        hops = int(np.argmax(amounts[1:, target])) + 1
+        if amounts[hops, target] <= 0.0:
+            return None
+        
+        # Walk predecessors back from the target to reconstruct the path
+        positions = []
+        node = target
+        for h in range(hops, 0, -1):
+            positions.append(int(pred_edge[h, node]))
+            node = int(predecessor[h, node])
+        positions.reverse()
+        return float(amounts[hops, target]), positions
+    
+    def _best_path(self, graph: CSRGraph, source: int, target: int, amount: float, edge_mask: np.ndarray,
+                   max_hops: int = MAX_PATH_HOPS) -> Optional[Tuple[float, List[int]]]:
+        """Run one relaxation from source and return (amount_out, edge positions) to target"""
+        return self._trace_path(self._relax_from(graph, source, amount, edge_mask, max_hops), target)
+    
+    def _simulate_path(self, graph: CSRGraph, positions: List[int], amount: float) -> List[float]:
+        """Amount held at every token along a path of CSR edge positions"""
+        amounts = [amount]
+        # Gather the pool arrays in one call rather than one NumPy scalar per hop
+        for reserve_in, reserve_out, fee_factor in zip(graph.reserve_a[positions].tolist(),
+                                                       graph.reserve_b[positions].tolist(),
+                                                       graph.fee_factor[positions].tolist()):
+            amount_in = amounts[-1] * fee_factor
+            amounts.append(reserve_out * amount_in / (reserve_in + amount_in))
+        return amounts
+    
+    def _reachable(self, graph: CSRGraph, roots: List[int], max_hops: int, reverse: bool = False) -> np.ndarray:
+        """Mask of the tokens within max_hops edges of roots, walking edges backwards if reverse"""
+        tails, heads = (graph.indices, graph.sources) if reverse else (graph.sources, graph.indices)
+        reached = np.zeros(graph.n_tokens, dtype=bool)
+        reached[roots] = True
+        for _ in range(max_hops):
+            frontier = np.zeros_like(reached)
+            frontier[heads[reached[tails]]] = True
+            frontier &= ~reached
+            if not frontier.any():
+                break
+            reached |= frontier
+        return reached
+    
+    def _extract_subgraph(self, graph: CSRGraph, src: int, dst: int, max_hops: int = SUBGRAPH_MAX_HOPS,
+                          forward: Optional[np.ndarray] = None) -> Tuple[CSRGraph, np.ndarray, np.ndarray]:
+        """Compact CSR view of the tokens reachable from src and reaching dst within max_hops
+        
+        Returns (subgraph, token ids, edge positions); the last two map the
+        subgraph's token ids and CSR positions back to graph. forward, the
+        tokens reachable from src, can be passed in when already known.
+        """
+        if forward is None:
+            forward = self._reachable(graph, [src], max_hops)
+        keep = forward & self._reachable(graph, [dst], max_hops, reverse=True)
+        
+        tokens = np.flatnonzero(keep).astype(np.int32)
+        remap = np.full(graph.n_tokens, -1, dtype=np.int32)
+        remap[tokens] = np.arange(len(tokens), dtype=np.int32)
+        
+        # Positions stay ordered by source token, and remap preserves that order
+        positions = np.flatnonzero(keep[graph.sources] & keep[graph.indices]).astype(np.int32)
+        sources = remap[graph.sources[positions]]
+        indptr = np.zeros(len(tokens) + 1, dtype=np.int32)
+        indptr[1:] = np.cumsum(np.bincount(sources, minlength=len(tokens)))
+        
+        edge_ids = graph.edge_ids[positions]
+        edge_pos = np.full(len(graph.edge_pos), -1, dtype=np.int32)
+        edge_pos[edge_ids] = np.arange(len(positions), dtype=np.int32)
+        
+        subgraph = CSRGraph(
+            indptr=indptr,
+            indices=remap[graph.indices[positions]],
+            sources=sources,
+            edge_ids=edge_ids,
+            edge_pos=edge_pos,
+            reserve_a=graph.reserve_a[positions],
+            reserve_b=graph.reserve_b[positions],
+            fee_factor=graph.fee_factor[positions],
         )
+        return subgraph, tokens, positions
     
-    def _k_shortest_paths(self, token_in: str, token_out: str, amount: int, k: int = 5) -> List[List[Tuple[str, str, Dict]]]:
-        """Find k shortest paths using modified Dijkstra algorithm"""
-        if token_in == token_out:
+    def _subgraph_token(self, tokens: np.ndarray, token_id: int) -> Optional[int]:
+        """Id of a token within a subgraph, or None if it was not kept"""
+        index = int(np.searchsorted(tokens, token_id))
+        if index < len(tokens) and tokens[index] == token_id:
+            return index
+        return None
+    
+    def _source_search(self, graph: CSRGraph, version: int, src: int) -> SourceSearch:
+        """Compute the search state every query from src can share"""
+        return SourceSearch(
+            graph=graph,
+            version=version,
+            forward=self._reachable(graph, [src], SUBGRAPH_MAX_HOPS),
+        )
+    
+    def _search_paths(self, graph: CSRGraph, src: int, dst: int, amount: int, k: int,
+                      shared: Optional[SourceSearch] = None) -> Tuple[List[List[int]], np.ndarray]:
+        """Yen's k best paths from src to dst, as lists of CSR edge positions
+        
+        The search runs on the subgraph around src and dst, whose token ids
+        are returned with the paths. A SourceSearch computed on graph supplies
+        the forward reach.
+        """
+        sub, tokens, positions = self._extract_subgraph(
+            graph, src, dst, forward=shared.forward if shared is not None else None
+        )
+        sub_src = self._subgraph_token(tokens, src)
+        sub_dst = self._subgraph_token(tokens, dst)
+        if sub_src is None or sub_dst is None:
+            return [], tokens
+        
+        accepted = self._yen_paths(sub, sub_src, sub_dst, amount, k)
+        return [positions[path].tolist() for path in accepted], tokens
+    
+    def _yen_paths(self, graph: CSRGraph, src: int, dst: int, amount: int, k: int) -> List[List[int]]:
+        """Yen's algorithm over Bellman-Ford relaxation on one CSR view
+        
+        Paths are at most MAX_PATH_HOPS hops long; spur paths get the hops
+        their root has left over.
+        """
+        edge_mask = np.ones(len(graph.indices), dtype=np.uint8)
+        # dst is a sink: a prefix through it would block the relaxation into it
+        # from a better path, and the spur masks below all start from this one
+        edge_mask[graph.indptr[dst]:graph.indptr[dst + 1]] = 0
+        best = self._best_path(graph, src, dst, float(amount), edge_mask)
+        if best is None:
             return []
         
-        # Prepare graph for routing
-        for u, v, data in self.graph.edges(data=True):
-            reserve_in = data.get('reserve_a', 0)
-            reserve_out = data.get('reserve_b', 0)
+        accepted = [best[1]]
+        seen = {tuple(best[1])}
+        candidates: Dict[Tuple[int, ...], float] = {}
+        
+        while len(accepted) < k:
+            last = accepted[-1]
+            nodes = [src] + graph.indices[last].tolist()
+            hop_amounts = self._simulate_path(graph, last, float(amount))
             
-            # Calculate price impact for this amount
-            price_impact = self._calculate_price_impact(amount, reserve_in, reserve_out)
-            data['price_impact'] = price_impact
+            # Deviate from the last accepted path at every spur token
+            for i in range(len(last)):
+                root = last[:i]
+                mask = edge_mask.copy()
+                for path in accepted:
+                    if len(path) > i and path[:i] == root:
+                        mask[path[i]] = 0
+                # Root tokens must not be re-entered by the spur path
+                mask[np.isin(graph.indices, nodes[:i])] = 0
+                
+                spur = self._best_path(graph, nodes[i], dst, hop_amounts[i], mask, MAX_PATH_HOPS - i)
+                if spur is None:
+                    continue
+                
+                candidate = tuple(root + spur[1])
+                if candidate not in seen:
+                    seen.add(candidate)
+                    candidates[candidate] = spur[0]
             
-            # Estimate gas cost
-            gas_cost = self._calculate_gas_cost(1, [data.get('exchange', '')])
-            data['gas_cost'] = gas_cost
+            if not candidates:
+                break
             
-            # Estimate slippage
-            data['slippage'] = 0.005  # Default slippage estimate
+            best_candidate = max(candidates, key=candidates.get)
+            del candidates[best_candidate]
+            accepted.append(list(best_candidate))
         
-        try:
-            # Find k shortest paths
-            paths = list(nx.shortest_simple_paths(
-                self.graph, 
-                token_in, 
-                token_out, 
-                weight=self._weight_function
-            ))
-            
-            # Limit to k paths
-            return [list(zip(path[:-1], path[1:], 
-                            [self.graph.get_edge_data(u, v) for u, v in zip(path[:-1], path[1:])])) 
-                    for path in paths[:k]]
-        except (nx.NetworkXNoPath, nx.NetworkXError) as e:
-            logger.warning(f"No path found: {e}")
+        return accepted
+    
+    def _materialize_paths(self, graph: CSRGraph, src: int,
+                           accepted: List[List[int]]) -> List[List[Tuple[TokenKey, TokenKey, Dict]]]:
+        """Turn CSR edge position lists into (token_in, token_out, edge data) paths
+        
+        Edge dicts are shared rather than copied: update_pool replaces them
+        instead of modifying them in place.
+        """
+        paths = []
+        for path in accepted:
+            nodes = [src] + graph.indices[path].tolist()
+            paths.append([
+                (self._token_keys[u], self._token_keys[v], self._edges[edge_id])
+                for u, v, edge_id in zip(nodes[:-1], nodes[1:], graph.edge_ids[path].tolist())
+            ])
+        return paths
+    
+    def _evict_routes(self, token_ids: Tuple[int, ...]) -> None:
+        """Drop cached routes searched on a subgraph holding any of the given tokens
+        
+        Reserves of pools elsewhere in the graph cannot change those results.
+        """
+        for token_id in token_ids:
+            for key in self._routes_by_token.pop(token_id, ()):
+                self._drop_route(key)
+    
+    def _cache_routes(self, key: RouteKey, accepted: List[List[int]], tokens: FrozenSet[int]) -> None:
+        """Cache the paths of a search, dropping the least recently used entry when full"""
+        if key in self._route_cache:
+            self._drop_route(key)
+        self._route_cache[key] = (accepted, tokens)
+        for token_id in tokens:
+            self._routes_by_token.setdefault(token_id, set()).add(key)
+        if len(self._route_cache) > ROUTE_CACHE_SIZE:
+            self._drop_route(next(iter(self._route_cache)))
+    
+    def _drop_route(self, key: RouteKey) -> None:
+        """Remove a cache entry and its reverse index references"""
+        entry = self._route_cache.pop(key, None)
+        if entry is None:
+            return
+        for token_id in entry[1]:
+            keys = self._routes_by_token.get(token_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._routes_by_token[token_id]
+    
+    async def _k_shortest_paths(self, token_in: TokenKey, token_out: TokenKey, amount: int, k: int = 5,
+                                shared: Optional[SourceSearch] = None
+                                ) -> List[List[Tuple[TokenKey, TokenKey, Dict]]]:
+        """Find the k best paths using Yen's algorithm over Bellman-Ford relaxation
+        
+        Path lists are cached per (token_in, token_out, power-of-two amount
+        bucket, k); searches run on the thread pool. A SourceSearch from
+        token_in can be passed in to skip that part of the work.
+        """
+        if token_in == token_out:
+            return []
+        
+        src = self._token_ids.get(token_in)
+        dst = self._token_ids.get(token_out)
+        if src is None or dst is None:
+            logger.warning(f"No path found: unknown token {token_in if src is None else token_out}")
             return []
+        
+        if shared is not None and shared.version != self._graph_version:
+            shared = None  # A pool changed after it was computed
+        graph = shared.graph if shared is not None else self._get_csr()
+        version = self._graph_version
+        cache_key = (src, dst, amount.bit_length(), k)
+        cached = self._route_cache.get(cache_key)
+        if cached is not None:
+            self.cache_hits += 1
+            self._route_cache.move_to_end(cache_key)
+            accepted = cached[0]
+        else:
+            self.cache_misses += 1
+            accepted, tokens = await self._run_on_graph(
+                graph, self._search_paths, graph, src, dst, amount, k, shared
+            )
+            if not accepted:
+                logger.warning(f"No path found from {token_in} to {token_out}")
+                return []
+            # A pool changed while the search ran would not have evicted it
+            if self._graph_version == version:
+                self._cache_routes(cache_key, accepted, frozenset(tokens.tolist()))
+        
+        logger.debug(f"Route cache: {self.cache_hits} hits, {self.cache_misses} misses")
+        return self._materialize_paths(graph, src, accepted)
     
-    def _path_to_swap_route(self, path: List[Tuple[str, str, Dict]], amount_in: int) -> SwapRoute:
-        """Convert a path to a SwapRoute object"""
+    def _simulate_routes(self, paths: List[List[Tuple[TokenKey, TokenKey, Dict]]],
+                         amount_in: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Chain swap outputs and price impacts along every path at once
+        
+        Returns an (n_paths, max_hops + 1) array holding the amount entering
+        each hop, and an (n_paths, max_hops) array of the price impact of each
+        hop at that amount; shorter paths are padded with pass-through hops.
+        """
+        n_paths = len(paths)
+        max_hops = max(len(path) for path in paths)
+        reserve_in = np.zeros((n_paths, max_hops))
+        reserve_out = np.zeros((n_paths, max_hops))
+        price = np.ones((n_paths, max_hops))
+        fee_factor = np.ones((n_paths, max_hops))
+        for i, path in enumerate(paths):
+            for j, (_, _, data) in enumerate(path):
+                reserve_in[i, j] = data['reserve_a']
+                reserve_out[i, j] = data['reserve_b']
+                price[i, j] = data['price']
+                fee_factor[i, j] = 1.0 - data['fee_tier'] * FEE_TIER_UNIT
+        has_reserves = (reserve_in > 0) & (reserve_out > 0)
+        
+        amounts = np.empty((n_paths, max_hops + 1))
+        amounts[:, 0] = amount_in
+        price_impact = np.empty((n_paths, max_hops))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for j in range(max_hops):
+                # The pool fee is taken from the input before the swap
+                current = amounts[:, j] * fee_factor[:, j]
+                price_impact[:, j] = self._calculate_price_impact(current, reserve_in[:, j], reserve_out[:, j])
+                # Constant product, in the form reserve_out * amount / (reserve_in + amount)
+                # rather than reserve_out - k / (reserve_in + amount): the difference of
+                # two large floats loses the output when amount is small next to reserves
+                swap_out = np.divide(reserve_out[:, j] * current, reserve_in[:, j] + current)
+                # Fallback to the quoted price if reserves are not available
+                amounts[:, j + 1] = np.floor(np.maximum(np.where(
+                    has_reserves[:, j],
+                    swap_out,
+                    current * price[:, j]
+                ), 0.0))
+        return amounts, price_impact
+    
+    def _path_to_swap_route(self, path: List[Tuple[TokenKey, TokenKey, Dict]], amount_in: int,
+                            hop_amounts: List[int], price_impact: float) -> SwapRoute:
+        """Convert a path and its simulated hop amounts and price impact to a SwapRoute object"""
         steps = []
-        current_amount = amount_in
-        exchanges = []
-        
-        for u, v, data in path:
-            token_in = self.tokens[u]
-            token_out = self.tokens[v]
-            exchange = data.get('exchange', '')
-            fee_tier = data.get('fee_tier', None)
-            
-            # Calculate output amount based on reserves and price impact
-            reserve_in = data.get('reserve_a', 0)
-            reserve_out = data.get('reserve_b', 0)
-            
-            if reserve_in > 0 and reserve_out > 0:
-                k = reserve_in * reserve_out
-                new_reserve_in = reserve_in + current_amount
-                new_reserve_out = k / new_reserve_in
-                output_amount = int(reserve_out - new_reserve_out)
-            else:
-                # Fallback if reserves not available
-                price = data.get('price', 1.0)
-                output_amount = int(current_amount * price)
-            
+        
+        for (u, v, data), current_amount, output_amount in zip(path, hop_amounts, hop_amounts[1:]):
             # Apply a slippage buffer
-            slippage = 0.005  # 0.5%
-            min_output = int(output_amount * (1 - slippage))
+            min_output = int(output_amount * (1 - DEFAULT_SLIPPAGE))
             
             step = SwapStep(
-                exchange_id=exchange,
-                token_in=token_in,
-                token_out=token_out,
-                fee_tier=fee_tier,
-                amount_in=str(current_amount),
-                amount_out_min=str(min_output)
+                exchange_id=data['exchange'],
+                token_in=self.tokens[u],
+                token_out=self.tokens[v],
+                fee_tier=data['fee_tier'],
+                amount_in=current_amount,
+                amount_out_min=min_output
             )
             
             steps.append(step)
-            exchanges.append(exchange)
-            current_amount = output_amount
         
         # Calculate overall metrics
-        price_impact = sum(data.get('price_impact', 0) for _, _, data in path)
-        gas_estimate = self._calculate_gas_cost(len(path), exchanges)
+        exch_ids = np.array([data['exchange_id'] for _, _, data in path], dtype=np.int32)
+        gas_estimate = self._calculate_gas_cost(len(path), exch_ids)
         risk_score = self._calculate_risk_score(path)
         
         return SwapRoute(
             steps=steps,
-            amount_in=str(amount_in),
-            expected_amount_out=str(current_amount),
+            amount_in=amount_in,
+            expected_amount_out=hop_amounts[-1],
             price_impact=price_impact,
             gas_estimate=gas_estimate,
             risk_score=risk_score
         )
     
+    def _paths_to_swap_routes(self, paths: List[List[Tuple[TokenKey, TokenKey, Dict]]], amount_in: int) -> List[SwapRoute]:
+        """Convert paths to SwapRoute objects, scoring all of them in one batch"""
+        amounts, price_impact = self._simulate_routes(paths, amount_in)
+        hop_counts = np.array([len(path) for path in paths])
+        # Sum each path's hop impacts, leaving out its padding hops
+        is_hop = np.arange(price_impact.shape[1]) < hop_counts[:, None]
+        path_impact = np.where(is_hop, price_impact, 0.0).sum(axis=1)
+        return [
+            self._path_to_swap_route(path, amount_in, [amount_in] + [int(a) for a in row[1:len(path) + 1]], impact)
+            for path, row, impact in zip(paths, amounts.tolist(), path_impact.tolist())
+        ]
+    
     async def find_routes(self, token_in: Token, token_out: Token, amount: int) -> List[SwapRoute]:
         """Find optimal routes between tokens"""
         logger.info(f"Finding routes from {token_in.symbol} to {token_out.symbol} for amount {amount}")
@@ -400,8 +1049,10 @@ class OptimizedRouter:
                 }
                 
                 # Call Rust engine
-                response_json = router_engine.find_routes(json.dumps(request))
-                response = json.loads(response_json)
+                if ORJSON_AVAILABLE:
+                    response = orjson.loads(router_engine.find_routes(orjson.dumps(request).decode()))
+                else:
+                    response = json.loads(router_engine.find_routes(json.dumps(request)))
                 
                 if response.get("routes"):
                     logger.info(f"Found {len(response['routes'])} routes using Rust engine")
@@ -412,24 +1063,83 @@ class OptimizedRouter:
                 logger.error(f"Error using Rust engine: {e}, falling back to Python implementation")
         
         # Fall back to Python implementation
-        token_in_key = f"{token_in.chain_id}_{token_in.address}"
-        token_out_key = f"{token_out.chain_id}_{token_out.address}"
+        token_in_key = self._token_key(token_in)
+        token_out_key = self._token_key(token_out)
         
         # Find k shortest paths
-        paths = self._k_shortest_paths(token_in_key, token_out_key, amount, k=5)
+        paths = await self._k_shortest_paths(token_in_key, token_out_key, amount, k=5)
         
         if not paths:
             logger.warning(f"No paths found from {token_in.symbol} to {token_out.symbol}")
             return []
         
         # Convert paths to swap routes
-        routes = [self._path_to_swap_route(path, amount) for path in paths]
+        routes = self._paths_to_swap_routes(paths, amount)
         
         # Apply ML model adjustments
         adjusted_routes = self.predictor.adjust(routes)
         
         logger.info(f"Found {len(adjusted_routes)} routes from {token_in.symbol} to {token_out.symbol}")
         return adjusted_routes
+    
+    async def find_routes_batch(self, orders: List[Tuple[Token, Token, int]]) -> List[List[SwapRoute]]:
+        """Find optimal routes for many (token_in, token_out, amount) orders at once
+        
+        Paths match find_routes for each order; the ML adjustment runs as one
+        batch (see PricePredictor.adjust_batch), so expected_amount_out can
+        differ slightly from a find_routes call.
+        """
+        logger.info(f"Finding routes for a batch of {len(orders)} orders")
+        
+        # The Rust engine takes one request at a time
+        if RUST_ENGINE_AVAILABLE:
+            return list(await asyncio.gather(*(self.find_routes(*order) for order in orders)))
+        
+        # Orders with the same input token share its forward reach; each order
+        # is then searched on the subgraph around its own token pair, as in
+        # find_routes
+        groups: Dict[TokenKey, List[int]] = {}
+        for i, (token_in, _, _) in enumerate(orders):
+            groups.setdefault(self._token_key(token_in), []).append(i)
+        
+        graph = self._get_csr()
+        version = self._graph_version
+        
+        async def route_group(token_in_key: TokenKey,
+                              members: List[int]) -> List[List[List[Tuple[TokenKey, TokenKey, Dict]]]]:
+            src = self._token_ids.get(token_in_key)
+            shared = None
+            if src is not None:
+                shared = await self._run_on_graph(graph, self._source_search, graph, version, src)
+            return await asyncio.gather(*(
+                self._k_shortest_paths(token_in_key, self._token_key(orders[i][1]), orders[i][2], k=5,
+                                       shared=shared)
+                for i in members
+            ))
+        
+        # Groups and their orders are searched concurrently on the thread pool
+        group_paths = await asyncio.gather(*(
+            route_group(token_in_key, members)
+            for token_in_key, members in groups.items()
+        ))
+        
+        results: List[List[SwapRoute]] = [[] for _ in orders]
+        found: List[int] = []
+        for members, member_paths in zip(groups.values(), group_paths):
+            for i, paths in zip(members, member_paths):
+                token_in, token_out, amount = orders[i]
+                if not paths:
+                    logger.warning(f"No paths found from {token_in.symbol} to {token_out.symbol}")
+                    continue
+                results[i] = self._paths_to_swap_routes(paths, amount)
+                found.append(i)
+        
+        # Apply ML model adjustments to the routes of all orders in one pass
+        for i, routes in zip(found, self.predictor.adjust_batch([results[i] for i in found])):
+            results[i] = routes
+        
+        logger.info(f"Found routes for {len(found)} of {len(orders)} orders")
+        return results
 
 
 async def execute_tx(tx_bundle: Dict[str, Any], flashbots_relay: str = "https://relay.flashbots.net") -> str:
@@ -486,7 +1196,7 @@ async def main():
     # Print routes
     for i, route in enumerate(routes):
         print(f"Route {i+1}:")
-        print(f"  Expected output: {int(route.expected_amount_out) / 10**18:.2f} DAI")
+        print(f"  Expected output: {route.expected_amount_out / 10**18:.2f} DAI")
         print(f"  Price impact: {route.price_impact:.2%}")
         print(f"  Gas estimate: {route.gas_estimate}")
         print(f"  Risk score: {route.risk_score}/5")
@@ -0,0 +1,33 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'router-engine'))
+
+import optimized_router as orr  # noqa: E402
+
+EXCHANGES = ['uniswap', 'sushiswap', 'curve', 'balancer', 'pancake']
+FEE_TIERS = [0.05, 0.3, 1.0]
+
+
+def make_token(symbol: str) -> orr.Token:
+    return orr.Token(1, f"0x{symbol}", symbol, 18)
+
+
+@pytest.fixture
+def random_router():
+    """Build a router over n_tokens tokens joined by n_pools random pools"""
+    def build(seed: int, n_tokens: int, n_pools: int) -> orr.OptimizedRouter:
+        rng = random.Random(seed)
+        tokens = [make_token(f"T{i}") for i in range(n_tokens)]
+        router = orr.OptimizedRouter()
+        for _ in range(n_pools):
+            token_a, token_b = rng.sample(tokens, 2)
+            reserve_a = rng.randint(10**20, 10**24)
+            reserve_b = rng.randint(10**20, 10**24)
+            router.add_pool(orr.Pool(rng.choice(EXCHANGES), token_a, token_b, rng.choice(FEE_TIERS),
+                                     reserve_a, reserve_b, reserve_b / reserve_a, 1e6))
+        return router
+    return build
@@ -0,0 +1,40 @@
+import pytest
+
+import optimized_router as orr
+
+
+def brute_force_paths(router, graph, src, dst, amount, k):
+    """Top k simple paths of at most MAX_PATH_HOPS hops by simulated output"""
+    found = []
+    
+    def walk(node, positions, seen):
+        if node == dst and positions:
+            found.append((router._simulate_path(graph, positions, amount)[-1], positions))
+            return
+        if len(positions) == orr.MAX_PATH_HOPS:
+            return
+        for pos in range(graph.indptr[node], graph.indptr[node + 1]):
+            nxt = int(graph.indices[pos])
+            if nxt not in seen:
+                walk(nxt, positions + [pos], seen | {nxt})
+    
+    walk(src, [], {src})
+    found.sort(key=lambda item: item[0], reverse=True)
+    return found[:k]
+
+
+# Two intermediate tokens joined by many parallel pools: the hop-layered
+# relaxation is exact there, so Yen's paths must match the enumeration
+@pytest.mark.parametrize('amount', [10**18, 10**21])
+@pytest.mark.parametrize('seed', range(40))
+def test_yen_matches_brute_force(random_router, seed, amount):
+    router = random_router(seed, 4, 12)
+    graph = router._get_csr()
+    src, dst = 0, graph.n_tokens - 1
+    
+    got, _ = router._search_paths(graph, src, dst, amount, 5)
+    expected = brute_force_paths(router, graph, src, dst, float(amount), 5)
+    
+    got_amounts = [router._simulate_path(graph, path, float(amount))[-1] for path in got]
+    assert got_amounts == pytest.approx([out for out, _ in expected], rel=1e-12)
+    assert len({tuple(path) for path in got}) == len(got)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+import optimized_router as orr
+
+KERNELS = {
+    'numba': orr.relax if orr.NUMBA_AVAILABLE else None,
+    'cython': orr.cython_relax if orr.CYTHON_KERNEL_AVAILABLE else None,
+}
+
+
+def relax_tree(kernel, graph, source, amount, edge_mask, max_hops=orr.MAX_PATH_HOPS):
+    shape = (max_hops + 1, graph.n_tokens)
+    amounts = np.zeros(shape, dtype=np.float64)
+    predecessor = np.full(shape, -1, dtype=np.int32)
+    pred_edge = np.full(shape, -1, dtype=np.int32)
+    amounts[0, source] = amount
+    kernel(graph.indptr, graph.indices, graph.reserve_a, graph.reserve_b, graph.fee_factor,
+           edge_mask, amounts, predecessor, pred_edge, max_hops)
+    return amounts, predecessor, pred_edge
+
+
+@pytest.mark.parametrize('name', sorted(KERNELS))
+@pytest.mark.parametrize('seed', range(5))
+def test_compiled_kernel_matches_interpreter(random_router, name, seed):
+    kernel = KERNELS[name]
+    if kernel is None:
+        pytest.skip(f"{name} kernel not built")
+    graph = random_router(seed, 60, 240)._get_csr()
+    interpreted = getattr(orr.relax, 'py_func', orr.relax)
+    
+    rng = np.random.default_rng(seed)
+    edge_mask = (rng.random(len(graph.indices)) > 0.2).astype(np.uint8)
+    for max_hops in (1, orr.MAX_PATH_HOPS):
+        expected = relax_tree(interpreted, graph, 0, 1e21, edge_mask, max_hops)
+        got = relax_tree(kernel, graph, 0, 1e21, edge_mask, max_hops)
+        np.testing.assert_allclose(got[0], expected[0], rtol=1e-12)
+        np.testing.assert_array_equal(got[1], expected[1])
+        np.testing.assert_array_equal(got[2], expected[2])
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import optimized_router as orr
+from conftest import make_token
+
+E = 10**18
+TOKENS = {symbol: make_token(symbol) for symbol in "ABCDEFGHIJKLMXY"}
+
+
+def pool(a, b, reserve, exchange='uniswap'):
+    return orr.Pool(exchange, TOKENS[a], TOKENS[b], 0.3, reserve, reserve, 1.0, 1e6)
+
+
+@pytest.fixture
+def router():
+    """A to B through eight shallow two-hop pairs and a deep A-F-G-H-B chain
+    
+    The F-G pool is thin at first, so the chain only becomes the best route
+    once update_pool deepens it. The eight two-hop routes fill the top k
+    without touching F, G or H.
+    """
+    router = orr.OptimizedRouter()
+    for mid in "CDEIJKLM":
+        router.add_pool(pool('A', mid, 2000 * E))
+        router.add_pool(pool(mid, 'B', 2000 * E))
+    for a, b in ("AF", "GH", "HB"):
+        router.add_pool(pool(a, b, 10**6 * E))
+    router.add_pool(pool('F', 'G', 10 * E))
+    return router
+
+
+def route_symbols(route):
+    return ''.join(step.token_in.symbol for step in route.steps) + route.steps[-1].token_out.symbol
+
+
+@pytest.mark.asyncio
+async def test_update_evicts_routes_searched_through_pool(router):
+    # The thin F-G pool keeps the chain out of the top k before the update
+    before = await router.find_routes(TOKENS['A'], TOKENS['B'], 100000 * E)
+    assert 'AFGHB' not in {route_symbols(route) for route in before}
+    
+    router.update_pool(pool('F', 'G', 10**6 * E))
+    after = await router.find_routes(TOKENS['A'], TOKENS['B'], 100000 * E)
+    assert route_symbols(after[0]) == 'AFGHB'
+    assert router.cache_hits == 0
+
+
+@pytest.mark.asyncio
+async def test_update_elsewhere_keeps_cached_routes(router):
+    # X-Y is not connected to the rest of the graph
+    router.add_pool(pool('X', 'Y', 10**6 * E))
+    await router.find_routes(TOKENS['A'], TOKENS['B'], 100000 * E)
+    
+    router.update_pool(pool('X', 'Y', 2 * 10**6 * E))
+    await router.find_routes(TOKENS['A'], TOKENS['B'], 100000 * E)
+    assert router.cache_hits == 1
+
+
+@pytest.mark.asyncio
+async def test_update_during_search_is_not_cached(router):
+    search = asyncio.ensure_future(router.find_routes(TOKENS['A'], TOKENS['B'], 100000 * E))
+    await asyncio.sleep(0)  # The search is now running on the thread pool
+    router.update_pool(pool('F', 'G', 10**6 * E))
+    await search
+    assert not router._route_cache
+    
+    routes = await router.find_routes(TOKENS['A'], TOKENS['B'], 100000 * E)
+    assert route_symbols(routes[0]) == 'AFGHB'
+
+
+@pytest.mark.asyncio
+async def test_cache_is_capped_and_indexed(router, monkeypatch):
+    monkeypatch.setattr(orr, 'ROUTE_CACHE_SIZE', 3)
+    for symbol in "CDEIJKLMB":
+        await router.find_routes(TOKENS['A'], TOKENS[symbol], 10 * E)
+    assert len(router._route_cache) == 3
+    
+    indexed = {key for keys in router._routes_by_token.values() for key in keys}
+    assert indexed == set(router._route_cache)
+    
+    router.update_pool(pool('A', 'C', 2000 * E))
+    indexed = {key for keys in router._routes_by_token.values() for key in keys}
+    assert indexed == set(router._route_cache)